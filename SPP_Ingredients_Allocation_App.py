@@ -1,101 +1,286 @@
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
 import streamlit as st
 import gspread
+from gspread.utils import absolute_range_name
 from oauth2client.service_account import ServiceAccountCredentials
 from dotenv import load_dotenv
 import os
 from datetime import datetime, timedelta
 import plotly.express as px
 import re
+import hashlib
+import threading
+import time
+import logging
+import tempfile
 
 # Load environment variables
 load_dotenv()
 
-def connect_to_gsheet():
+logger = logging.getLogger(__name__)
+
+# Google Sheets source
+SPREADSHEET_NAME = "BROWNS STOCK MANAGEMENT"
+SHEET_NAME = "CHECK_OUT"
+DATE_FORMAT = "%Y-%m-%d"
+# Sheet columns the app keeps; the others are dropped as soon as the rows arrive
+SHEET_COLUMNS = ["DATE", "ITEM_SERIAL", "ITEM_NAME", "DEPARTMENT", "ISSUED_TO",
+                 "QUANTITY", "UNIT_OF_MEASURE", "DEPARTMENT_CAT"]
+# Day zero of the serial numbers Sheets returns for date cells
+SHEETS_EPOCH = "1899-12-30"
+
+# Age after which loaded sheet data is refreshed in the background
+DATA_TTL_SECONDS = 3600
+# Wait after a failed load before Google Sheets is tried again
+LOAD_RETRY_SECONDS = 300
+
+# Directory holding this script; local files are resolved against it rather
+# than the working directory streamlit was started from
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Local Parquet copies of the fetched sheet, reused until the spreadsheet changes
+CACHE_DIR = os.path.join(APP_DIR, ".cache")
+# Bump whenever the loader's output changes so existing copies are not reused
+CACHE_VERSION = 2
+
+# App stylesheet, kept next to this script
+CSS_PATH = os.path.join(APP_DIR, "assets", "app.css")
+
+# Most ingredients offered in a selectbox for one search term
+MAX_SEARCH_RESULTS = 50
+
+@st.cache_resource
+def get_gsheet_client():
     """
-    Authenticate and connect to Google Sheets.
+    Authenticate with Google once and reuse the client across reruns.
     """
     scope = ["https://spreadsheets.google.com/feeds", 
              "https://www.googleapis.com/auth/spreadsheets",
              "https://www.googleapis.com/auth/drive.file", 
              "https://www.googleapis.com/auth/drive"]
     
-    try:
-        credentials = {
-            "type": "service_account",
-            "project_id": os.getenv("GOOGLE_PROJECT_ID"),
-            "private_key_id": os.getenv("GOOGLE_PRIVATE_KEY_ID"),
-            "private_key": os.getenv("GOOGLE_PRIVATE_KEY", "").replace("\\n", "\n"),
-            "client_email": os.getenv("GOOGLE_CLIENT_EMAIL"),
-            "client_id": os.getenv("GOOGLE_CLIENT_ID"),
-            "auth_uri": "https://accounts.google.com/o/oauth2/auth",
-            "token_uri": "https://oauth2.googleapis.com/token",
-            "auth_provider_x509_cert_url": "https://www.googleapis.com/oauth2/v1/certs",
-            "client_x509_cert_url": os.getenv("GOOGLE_CLIENT_X509_CERT_URL")
-        }
+    credentials = {
+        "type": "service_account",
+        "project_id": os.getenv("GOOGLE_PROJECT_ID"),
+        "private_key_id": os.getenv("GOOGLE_PRIVATE_KEY_ID"),
+        "private_key": os.getenv("GOOGLE_PRIVATE_KEY", "").replace("\\n", "\n"),
+        "client_email": os.getenv("GOOGLE_CLIENT_EMAIL"),
+        "client_id": os.getenv("GOOGLE_CLIENT_ID"),
+        "auth_uri": "https://accounts.google.com/o/oauth2/auth",
+        "token_uri": "https://oauth2.googleapis.com/token",
+        "auth_provider_x509_cert_url": "https://www.googleapis.com/oauth2/v1/certs",
+        "client_x509_cert_url": os.getenv("GOOGLE_CLIENT_X509_CERT_URL")
+    }
+
+    client_credentials = ServiceAccountCredentials.from_json_keyfile_dict(credentials, scope)
+    return gspread.authorize(client_credentials)
+
+@st.cache_resource(ttl=3000, show_spinner=False)
+def open_spreadsheet(spreadsheet_name):
+    """
+    Open a spreadsheet by name once and reuse the handle across reruns and sessions.
+    
+    Opening searches Drive and fetches the spreadsheet metadata; failures raise,
+    so they are never cached.
+    """
+    return get_gsheet_client().open(spreadsheet_name)
 
-        client_credentials = ServiceAccountCredentials.from_json_keyfile_dict(credentials, scope)
-        client = gspread.authorize(client_credentials)
-        spreadsheet = client.open('BROWNS STOCK MANAGEMENT')  
-        return spreadsheet.worksheet('CHECK_OUT')
+def connect_to_gsheet(spreadsheet_name=SPREADSHEET_NAME):
+    """
+    Connect to a spreadsheet in Google Sheets.
+    """
+    try:
+        return open_spreadsheet(spreadsheet_name)
     except Exception as e:
+        logger.exception("Failed to connect to Google Sheets")
         st.error(f"Failed to connect to Google Sheets: {e}")
         return None
 
-def load_all_data_from_google_sheet():
+def get_sheet_cache_path(spreadsheet, sheet_name):
     """
-    Load ALL data from Google Sheets without date filtering.
+    Path of the local Parquet copy for the spreadsheet's current revision.
+    
+    The revision is the Drive last-modified time, so any edit to the spreadsheet
+    points at a new file. Returns None if the revision cannot be read.
+    """
+    try:
+        revision = spreadsheet.get_lastUpdateTime()
+    except Exception:
+        return None
+    
+    prefix = re.sub(r'\W+', '_', f"{spreadsheet.title}_{sheet_name}")
+    revision = re.sub(r'[^0-9A-Za-z]', '', revision)
+    return os.path.join(CACHE_DIR, f"{prefix}_{revision}-v{CACHE_VERSION}.parquet")
+
+def read_sheet_cache(cache_path):
+    """
+    Read a Parquet cache file, or return None if it is missing or unreadable.
+    
+    An unreadable file is deleted so the next load rebuilds it from the network.
     """
-    with st.spinner("Loading all data from Google Sheets..."):
+    if not os.path.exists(cache_path):
+        return None
+    try:
+        # Memory-mapping reads the file without an extra buffered copy
+        df = pd.read_parquet(cache_path, engine="pyarrow", memory_map=True)
+    except Exception:
+        logger.exception("Discarding unreadable cache file %s", cache_path)
         try:
-            worksheet = connect_to_gsheet()
-            if worksheet is None:
-                return None
-            
-            # Get all data
-            all_values = worksheet.get_all_values()
-            
-            if not all_values or len(all_values) < 2:
-                st.error("No data found in the Google Sheet.")
-                return None
-            
-            # Get headers and data
-            headers = all_values[0]
-            data_rows = all_values[1:]
-            
-            # Create DataFrame
-            df = pd.DataFrame(data_rows, columns=headers)
-            
-            # Convert DATE - handle YYYY-MM-DD format
-            df["DATE"] = pd.to_datetime(df["DATE"], errors='coerce')
-            
-            # Clean QUANTITY - remove non-numeric characters
-            df["QUANTITY"] = pd.to_numeric(
-                df["QUANTITY"].astype(str).str.replace(r'[^\d.-]', '', regex=True), 
+            os.remove(cache_path)
+        except OSError:
+            pass
+        return None
+    
+    # Categories come back as object; restore the Arrow-backed categories
+    # a fresh load produces so both paths return the same dtypes
+    for col in df.select_dtypes("category").columns:
+        df[col] = df[col].cat.rename_categories(
+            df[col].cat.categories.astype("string[pyarrow]")
+        )
+    return df
+
+def save_sheet_cache(df, cache_path):
+    """
+    Write the loaded data to its Parquet cache file and remove older revisions.
+    
+    Caching is best-effort: a failed write leaves the app working from the network.
+    """
+    temp_path = None
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        
+        # Write to a private temporary file first so concurrent writers never share
+        # a file and readers never see a partial one
+        fd, temp_path = tempfile.mkstemp(dir=CACHE_DIR, suffix=".tmp")
+        os.close(fd)
+        df.to_parquet(temp_path, engine="pyarrow", compression="zstd")
+        os.replace(temp_path, cache_path)
+        temp_path = None
+        
+        # Older revisions of this sheet only - other sheets whose names extend this
+        # one share the prefix but not the "<prefix>_<revision>-v<N>" shape
+        prefix = os.path.basename(cache_path).rsplit("_", 1)[0]
+        old_revision = re.compile(re.escape(prefix) + r"_[0-9A-Za-z]+-v\d+\.parquet")
+        for name in os.listdir(CACHE_DIR):
+            path = os.path.join(CACHE_DIR, name)
+            if old_revision.fullmatch(name) and path != cache_path:
+                os.remove(path)
+    except Exception:
+        logger.exception("Could not write cache file %s", cache_path)
+    finally:
+        if temp_path is not None:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+
+def load_all_data_from_google_sheet(spreadsheet_name=SPREADSHEET_NAME, sheet_name=SHEET_NAME):
+    """
+    Load ALL data from Google Sheets without date filtering.
+    """
+    try:
+        spreadsheet = connect_to_gsheet(spreadsheet_name)
+        if spreadsheet is None:
+            return None
+        
+        # Reuse the local copy while the spreadsheet is unchanged - reading Parquet
+        # skips the download and every conversion below
+        cache_path = get_sheet_cache_path(spreadsheet, sheet_name)
+        if cache_path is not None:
+            df = read_sheet_cache(cache_path)
+            if df is not None:
+                return df
+        
+        # Get all data in a single values request (no worksheet metadata lookup).
+        # Unformatted values return numbers and date serials as JSON numbers, so they
+        # need no string parsing; the fields mask drops the response metadata
+        value_range = spreadsheet.values_batch_get(
+            [absolute_range_name(sheet_name)],
+            params={
+                "majorDimension": "ROWS",
+                "valueRenderOption": "UNFORMATTED_VALUE",
+                "dateTimeRenderOption": "SERIAL_NUMBER",
+                "fields": "valueRanges.values"
+            }
+        )["valueRanges"][0]
+        all_values = value_range.get("values", [])
+        
+        if not all_values or len(all_values) < 2:
+            logger.error("No data found in the Google Sheet.")
+            st.error("No data found in the Google Sheet.")
+            return None
+        
+        # Get headers and data
+        headers = all_values[0]
+        data_rows = all_values[1:]
+        
+        # Create DataFrame column by column with only the columns the app uses, which
+        # skips building a row-major object matrix of the whole sheet; rows the API
+        # trimmed of empty trailing cells are padded with ""
+        df = pd.DataFrame({
+            col: [row[pos] if pos < len(row) else "" for row in data_rows]
+            for col, pos in ((col, headers.index(col)) for col in SHEET_COLUMNS if col in headers)
+        })
+        
+        # Clean QUANTITY - numeric cells arrive as numbers; only text cells need
+        # non-numeric characters removed. float32 is ample precision for stock
+        # quantities and halves the memory the usage sums read through
+        quantity = pd.to_numeric(df["QUANTITY"], errors='coerce')
+        text_quantity = quantity.isna()
+        if text_quantity.any():
+            quantity[text_quantity] = pd.to_numeric(
+                df.loc[text_quantity, "QUANTITY"].astype(str).str.replace(r'[^\d.-]', '', regex=True), 
                 errors='coerce'
             )
-            
-            # Clean text columns
-            text_columns = ["ITEM_NAME", "DEPARTMENT", "ITEM_SERIAL", "ISSUED_TO", 
-                          "UNIT_OF_MEASURE", "ITEM_CATEGORY", "DEPARTMENT_CAT", "STORE"]
-            for col in text_columns:
-                if col in df.columns:
-                    df[col] = df[col].astype(str).str.strip()
-            
-            # Remove rows with invalid quantities or dates
-            df = df.dropna(subset=["QUANTITY"])
-            df = df[df["QUANTITY"] > 0]  # Only keep positive quantities
-            
-            # Add quarter info for rows with valid dates
-            df["QUARTER"] = df["DATE"].dt.to_period("Q")
-            
-            return df
-            
-        except Exception as e:
-            st.error(f"Error loading data: {str(e)}")
-            import traceback
-            st.error(f"Detailed error: {traceback.format_exc()}")
-            return None
+        df["QUANTITY"] = quantity.astype(np.float32)
+        
+        # Remove rows with invalid quantities first, so the conversions below only
+        # run on rows that are kept (NaN quantities fail the comparison too)
+        df = df[df["QUANTITY"] > 0]  # Only keep positive quantities
+        
+        # Convert DATE - date cells arrive as day serials; dates typed as text fall back
+        # to an explicit format, which uses the fast parser instead of per-value inference
+        date_serial = pd.to_numeric(df["DATE"], errors='coerce')
+        dates = pd.to_datetime(np.floor(date_serial), unit="D", origin=SHEETS_EPOCH)
+        text_date = date_serial.isna()
+        if text_date.any():
+            dates[text_date] = pd.to_datetime(df.loc[text_date, "DATE"], format=DATE_FORMAT, errors='coerce')
+        df["DATE"] = dates
+        
+        # Clean text columns - Arrow-backed strings are compact and strip/lower/compare
+        # run as vectorized Arrow kernels instead of per-object Python calls
+        text_columns = ["ITEM_NAME", "DEPARTMENT", "ITEM_SERIAL", "ISSUED_TO", 
+                      "UNIT_OF_MEASURE", "DEPARTMENT_CAT"]
+        for col in text_columns:
+            if col in df.columns:
+                df[col] = df[col].astype("string[pyarrow]").str.strip()
+        
+        # Lowercase lookup columns, computed once here instead of on every calculation
+        df["ITEM_NAME_LOWER"] = df["ITEM_NAME"].str.lower()
+        if "ITEM_SERIAL" in df.columns:
+            df["ITEM_SERIAL_LOWER"] = df["ITEM_SERIAL"].str.lower()
+        
+        # Store the cleaned text and lookup columns as categoricals - all are
+        # low-cardinality, so equality filters and groupbys work on small integer
+        # codes and string methods run once per category instead of once per row
+        for col in text_columns + ["ITEM_NAME_LOWER", "ITEM_SERIAL_LOWER"]:
+            if col in df.columns:
+                df[col] = df[col].astype("category")
+        
+        if cache_path is not None:
+            save_sheet_cache(df, cache_path)
+        
+        return df
+        
+    except Exception as e:
+        logger.exception("Error loading data")
+        st.error(f"Error loading data: {str(e)}")
+        import traceback
+        st.error(f"Detailed error: {traceback.format_exc()}")
+        return None
 
 def filter_data_by_date_range(df, start_date=None, end_date=None, default_range="last_2_years"):
     """
@@ -110,13 +295,15 @@ def filter_data_by_date_range(df, start_date=None, end_date=None, default_range=
     if df is None or df.empty:
         return df
     
-    filtered_df = df.copy()
+    # Boolean indexing already returns a new frame, so the rows are not copied up
+    # front; the bounds are compared directly against the datetime64 buffer
+    dates = df["DATE"].to_numpy()
     
     # If specific dates are provided, use them
     if start_date is not None and end_date is not None:
-        filtered_df = filtered_df[
-            (filtered_df["DATE"] >= pd.Timestamp(start_date)) & 
-            (filtered_df["DATE"] <= pd.Timestamp(end_date))
+        filtered_df = df[
+            (dates >= pd.Timestamp(start_date).to_datetime64()) & 
+            (dates <= pd.Timestamp(end_date).to_datetime64())
         ]
     else:
         # Use default range
@@ -138,16 +325,92 @@ def filter_data_by_date_range(df, start_date=None, end_date=None, default_range=
         
         end_date = pd.Timestamp(today)
         
-        filtered_df = filtered_df[
-            (filtered_df["DATE"] >= start_date) & 
-            (filtered_df["DATE"] <= end_date)
+        filtered_df = df[
+            (dates >= start_date.to_datetime64()) & 
+            (dates <= end_date.to_datetime64())
         ]
     
     return filtered_df
 
-@st.cache_data(ttl=3600)
-def get_all_cached_data():
-    return load_all_data_from_google_sheet()
+@st.cache_resource(show_spinner=False)
+def get_data_store(spreadsheet_name, sheet_name):
+    """
+    Process-wide holder for the latest loaded frame of a sheet.
+    
+    Sharing one read-only frame across sessions avoids unpickling a fresh copy on
+    every hit - nothing modifies it in place. Clear this resource to force a reload.
+    """
+    return {"data": None, "load_due_at": 0.0, "refreshing": False,
+            "last_error": None, "lock": threading.Lock(), "load_lock": threading.Lock()}
+
+def load_data_into_store(store, spreadsheet_name, sheet_name):
+    """
+    Reload the sheet into the store, keeping the current frame if the load fails.
+    
+    Safe to run off the script thread: failures are logged and recorded in the
+    store's last_error, and the next attempt waits LOAD_RETRY_SECONDS. Loads are
+    serialized by the store's load_lock; a caller that waited on another load
+    gets that load's result instead of fetching the sheet again.
+    """
+    with store["load_lock"]:
+        with store["lock"]:
+            if time.monotonic() < store["load_due_at"]:
+                store["refreshing"] = False
+                return store["data"]
+        
+        data = None
+        try:
+            data = load_all_data_from_google_sheet(spreadsheet_name, sheet_name)
+        finally:
+            with store["lock"]:
+                if data is not None:
+                    store["data"], store["last_error"] = data, None
+                    store["load_due_at"] = time.monotonic() + DATA_TTL_SECONDS
+                else:
+                    store["last_error"] = f"Loading from Google Sheets failed at {datetime.now():%H:%M}"
+                    store["load_due_at"] = time.monotonic() + LOAD_RETRY_SECONDS
+                store["refreshing"] = False
+    
+    if data is None:
+        logger.warning("Sheet load failed; next attempt in %d seconds", LOAD_RETRY_SECONDS)
+    return data
+
+def get_all_cached_data(spreadsheet_name=SPREADSHEET_NAME, sheet_name=SHEET_NAME):
+    """
+    Get all sheet data, serving stale data while a background thread refreshes it.
+    
+    Only the very first load waits on Google Sheets; once the data is older than
+    DATA_TTL_SECONDS the current frame is returned and a refresh starts behind it.
+    Cheap enough to call on every rerun, which is how sessions pick up new data.
+    """
+    store = get_data_store(spreadsheet_name, sheet_name)
+    with store["lock"]:
+        data = store["data"]
+        load_due = time.monotonic() >= store["load_due_at"]
+        start_refresh = data is not None and load_due and not store["refreshing"]
+        if start_refresh:
+            store["refreshing"] = True
+    
+    if data is None:
+        if not load_due:
+            # The last load failed recently - wait out the retry interval
+            return None
+        with st.spinner("Loading all data from Google Sheets..."):
+            return load_data_into_store(store, spreadsheet_name, sheet_name)
+    
+    if start_refresh:
+        try:
+            threading.Thread(
+                target=load_data_into_store,
+                args=(store, spreadsheet_name, sheet_name),
+                daemon=True
+            ).start()
+        except RuntimeError:
+            # Threads unavailable - refresh in the foreground instead
+            load_data_into_store(store, spreadsheet_name, sheet_name)
+            data = store["data"]
+    
+    return data
 
 def find_similar_items(df, search_term, max_results=10):
     """Find similar items in the database."""
@@ -185,63 +448,148 @@ def find_similar_items(df, search_term, max_results=10):
     similar_items.sort(key=lambda x: x[1], reverse=True)
     return [item for item, score in similar_items[:max_results]]
 
-def calculate_proportion(df, identifier, department=None, min_proportion=1.0):
+@st.cache_data(ttl=3600, show_spinner=False)
+def build_usage_index(_df, index_key):
+    """
+    Pre-aggregate QUANTITY per department for every item name and serial.
+    
+    Returns two dicts mapping the lowercase item name (and lowercase serial) to an
+    array of total QUANTITY per department, plus the department labels for those
+    arrays, so each allocation request is a dictionary lookup instead of a
+    filter + groupby over every row.
+    """
+    # The lookup columns are categoricals, so their codes are ready-made bincount
+    # bins and no factorizing pass over the rows is needed
+    dept_codes = _df["DEPARTMENT"].cat.codes.to_numpy()
+    departments = _df["DEPARTMENT"].cat.categories
+    quantities = _df["QUANTITY"].to_numpy()
+    
+    def sum_per_department(keys):
+        # One bincount over combined (key, department) codes fills the whole
+        # key x department table without building a groupby hash table
+        key_codes = keys.cat.codes.to_numpy()
+        key_values = keys.cat.categories
+        valid = (key_codes >= 0) & (dept_codes >= 0)
+        sums = np.bincount(
+            key_codes[valid].astype(np.int64) * len(departments) + dept_codes[valid],
+            weights=quantities[valid],
+            minlength=len(key_values) * len(departments)
+        ).reshape(len(key_values), len(departments))
+        
+        # Categories can outlive their rows after date filtering - keep only used keys
+        used = sums.any(axis=1)
+        return dict(zip(key_values[used], sums[used]))
+    
+    usage_by_name = sum_per_department(_df["ITEM_NAME_LOWER"])
+    
+    usage_by_serial = {}
+    if "ITEM_SERIAL_LOWER" in _df.columns:
+        usage_by_serial = sum_per_department(_df["ITEM_SERIAL_LOWER"])
+    
+    return usage_by_name, usage_by_serial, np.asarray(departments, dtype=object)
+
+def get_usage_index(df):
+    """
+    Get the cached usage index for a DataFrame.
+    
+    Returns (usage_by_name, usage_by_serial, departments, index_key), where
+    index_key is a fingerprint of the lookup columns that keys every cache built
+    on the index.
+    """
+    # Only the lookup columns are fingerprinted, which keeps hashing cheap
+    index_columns = [col for col in ["ITEM_NAME_LOWER", "ITEM_SERIAL_LOWER", "DEPARTMENT", "QUANTITY"]
+                     if col in df.columns]
+    lookup = df[index_columns]
+    index_key = hashlib.md5(pd.util.hash_pandas_object(lookup).to_numpy().tobytes()).hexdigest()
+    usage_by_name, usage_by_serial, departments = build_usage_index(lookup, index_key)
+    return usage_by_name, usage_by_serial, departments, index_key
+
+def calculate_proportion(df, identifier, department=None, min_proportion=1.0, usage_index=None):
     """
     Calculate department-wise usage proportion with improved matching.
+    
+    Pass a usage_index from get_usage_index() when calculating several items
+    against the same data, so the index is only looked up once.
     """
     if df is None or df.empty:
         return None
     
+    if usage_index is None:
+        usage_index = get_usage_index(df)
+    
+    return calculate_proportion_from_index(usage_index, usage_index[3], identifier, department, min_proportion)
+
+@st.cache_data(ttl=3600, max_entries=1024, show_spinner=False)
+def calculate_proportion_from_index(_usage_index, index_key, identifier, department, min_proportion):
+    """
+    Memoized core of calculate_proportion, keyed by the data fingerprint and the request.
+    """
     try:
+        usage_by_name, usage_by_serial, departments, _ = _usage_index
+        
+        # Matching runs over the unique item names rather than every row
+        names = pd.Series(list(usage_by_name), dtype=object)
+        
         # Clean the identifier (remove extra spaces, convert to lowercase)
         clean_identifier = str(identifier).strip().lower()
         
         # Try multiple matching strategies
-        filtered_df = None
+        matched = []
+        usage_lookup = usage_by_name
         
         # Strategy 1: Exact match (case-insensitive)
-        filtered_df = df[df["ITEM_NAME"].str.lower() == clean_identifier]
+        if clean_identifier in usage_by_name:
+            matched = [clean_identifier]
         
-        # Strategy 2: Contains match (if exact fails)
-        if filtered_df.empty:
-            filtered_df = df[df["ITEM_NAME"].str.lower().str.contains(clean_identifier, na=False)]
+        # Strategy 2: Contains match (if exact fails) - a literal substring, so names
+        # with brackets or dots match as typed and no regex is compiled
+        if not matched:
+            matched = names[names.str.contains(clean_identifier, regex=False, na=False)].tolist()
         
         # Strategy 3: Partial word matching (handle variations)
-        if filtered_df.empty:
+        if not matched:
             # Split into words and search for any match
             search_words = clean_identifier.split()
             if search_words:
                 # Create a pattern that matches any of the words
                 pattern = '|'.join([re.escape(word) for word in search_words if len(word) > 2])
                 if pattern:
-                    filtered_df = df[df["ITEM_NAME"].str.lower().str.contains(pattern, na=False)]
+                    matched = names[names.str.contains(pattern, na=False)].tolist()
         
         # Strategy 4: Try removing special characters and extra spaces
-        if filtered_df.empty:
+        if not matched:
             clean_identifier_simple = re.sub(r'[^\w\s]', '', clean_identifier).strip()
-            filtered_df = df[df["ITEM_NAME"].str.lower().str.replace(r'[^\w\s]', '', regex=True).str.strip() == clean_identifier_simple]
+            matched = names[names.str.replace(r'[^\w\s]', '', regex=True).str.strip() == clean_identifier_simple].tolist()
         
         # Strategy 5: Try ITEM_SERIAL if available
-        if filtered_df.empty and "ITEM_SERIAL" in df.columns:
+        if not matched and usage_by_serial:
             # Check if identifier looks like a serial number
             if any(char.isdigit() for char in str(identifier)):
-                filtered_df = df[df["ITEM_SERIAL"].astype(str).str.contains(str(identifier), case=False, na=False)]
+                usage_lookup = usage_by_serial
+                if clean_identifier in usage_by_serial:
+                    # Exact serial - direct hash lookup
+                    matched = [clean_identifier]
+                else:
+                    serials = pd.Series(list(usage_by_serial), dtype=object)
+                    matched = serials[serials.str.contains(str(identifier).lower(), regex=False, na=False)].tolist()
         
-        if filtered_df.empty:
+        if not matched:
             return None
         
+        # Combine the pre-aggregated usage of every matched item
+        totals = np.sum([usage_lookup[key] for key in matched], axis=0)
+        
         # Filter by department if specified
         if department and department != "All Production Areas":
-            filtered_df = filtered_df[filtered_df["DEPARTMENT"] == department]
-            if filtered_df.empty:
-                return None
+            totals = np.where(departments == department, totals, 0)
         
-        # Group by department
-        dept_usage = filtered_df.groupby("DEPARTMENT")["QUANTITY"].sum().reset_index()
-        
-        if dept_usage.empty:
+        # Keep the departments that used the item
+        used = totals > 0
+        if not used.any():
             return None
         
+        dept_usage = pd.DataFrame({"DEPARTMENT": departments[used], "QUANTITY": totals[used]})
+        
         total_usage = dept_usage["QUANTITY"].sum()
         if total_usage <= 0:
             return None
@@ -254,7 +602,7 @@ def calculate_proportion(df, identifier, department=None, min_proportion=1.0):
         
         if significant.empty and not dept_usage.empty:
             # Return the department with highest proportion
-            significant = pd.DataFrame([dept_usage.loc[dept_usage["PROPORTION"].idxmax()]])
+            significant = dept_usage.iloc[[dept_usage["PROPORTION"].to_numpy().argmax()]].copy()
         
         # Normalize to 100%
         total_prop = significant["PROPORTION"].sum()
@@ -272,43 +620,50 @@ def calculate_proportion(df, identifier, department=None, min_proportion=1.0):
         st.error(f"Detailed error: {traceback.format_exc()}")
         return None
 
-def allocate_quantity(df, identifier, available_quantity, department=None):
+def allocate_quantity(df, identifier, available_quantity, department=None, usage_index=None):
     """
     Allocate quantity based on historical proportions.
     """
-    proportions = calculate_proportion(df, identifier, department, min_proportion=1.0)
+    proportions = calculate_proportion(df, identifier, department, min_proportion=1.0,
+                                       usage_index=usage_index)
     
     if proportions is None:
         return None
     
     # Calculate allocation
-    proportions["ALLOCATED_QUANTITY"] = (proportions["PROPORTION"] / 100) * available_quantity
-    
-    # Round to integers
-    proportions["ALLOCATED_QUANTITY"] = proportions["ALLOCATED_QUANTITY"].round().astype(int)
-    
-    # Adjust to match total
-    allocated_sum = proportions["ALLOCATED_QUANTITY"].sum()
-    difference = int(available_quantity - allocated_sum)
-    
-    if difference > 0:
-        # Add to departments with largest fractional parts
-        fractional = (proportions["PROPORTION"] / 100) * available_quantity - proportions["ALLOCATED_QUANTITY"]
-        indices = fractional.nlargest(difference).index
-        for idx in indices:
-            proportions.at[idx, "ALLOCATED_QUANTITY"] += 1
-    elif difference < 0:
-        # Subtract from departments with smallest fractional parts
-        fractional = (proportions["PROPORTION"] / 100) * available_quantity - (proportions["ALLOCATED_QUANTITY"] - 1)
-        indices = fractional.nsmallest(-difference).index
-        for idx in indices:
-            proportions.at[idx, "ALLOCATED_QUANTITY"] -= 1
+    exact = (proportions["PROPORTION"].to_numpy() / 100) * available_quantity
+    
+    # Largest-remainder rounding: floor every share, then give the units lost to
+    # flooring to the departments with the largest fractional parts. The total is
+    # the quantity rounded half up, so every .5 batch rounds the same way
+    allocated = np.floor(exact).astype(int)
+    shortfall = int(np.floor(available_quantity + 0.5)) - allocated.sum()
+    if shortfall > 0:
+        allocated[np.argsort(allocated - exact, kind="stable")[:shortfall]] += 1
+    
+    proportions["ALLOCATED_QUANTITY"] = allocated
     
     return proportions
 
+def to_csv_bytes(df):
+    """
+    Encode a DataFrame as CSV for a download button using pyarrow's C writer.
+    """
+    buffer = pa.BufferOutputStream()
+    pa_csv.write_csv(
+        pa.Table.from_pandas(df, preserve_index=False),
+        buffer,
+        write_options=pa_csv.WriteOptions(quoting_style="needed")
+    )
+    return buffer.getvalue().to_pybytes()
+
+@st.cache_data(ttl=3600, max_entries=256, show_spinner=False)
 def generate_allocation_chart(result_df, item_name):
     """
     Generate allocation chart with lighter cheese theme colors.
+    
+    Memoized on the (small) result table, so resubmitting an allocation reuses
+    the figure instead of rebuilding it through plotly express.
     """
     # Lighter, more appetizing cheese color palette
     cheese_colors = ['#FFE4B5', '#FFDAB9', '#FFE4C4', '#FAEBD7', '#F5F5DC', '#FFF8DC']
@@ -343,246 +698,20 @@ st.set_page_config(
 )
 
 # Custom CSS with Lighter, Softer Cheese/Dairy Theme
-st.markdown("""
-<style>
-    /* Lighter, softer color palette */
-    :root {
-        --cream-yellow: #FFF8E1;
-        --light-cheese: #FFE4B5;
-        --soft-gold: #FFDAB9;
-        --warm-beige: #FAEBD7;
-        --ivory: #F5F5DC;
-        --light-brown: #D2B48C;
-        --medium-brown: #8B7355;
-        --soft-brown: #A67B5B;
-        --milk-white: #FFFDF6;
-        --off-white: #FAF9F6;
-    }
-    
-    .main-title {
-        text-align: center;
-        color: var(--medium-brown);
-        padding: 25px;
-        background: linear-gradient(135deg, var(--light-cheese) 0%, var(--soft-gold) 100%);
-        border-radius: 15px;
-        margin-bottom: 30px;
-        border: 2px solid var(--light-brown);
-        font-family: 'Georgia', serif;
-        box-shadow: 0 4px 12px rgba(139, 115, 85, 0.1);
-    }
-    
-    .main-title h1 {
-        font-size: 38px;
-        font-weight: bold;
-        text-shadow: 1px 1px 2px rgba(255, 255, 255, 0.8);
-        margin-bottom: 10px;
-        color: var(--medium-brown);
-    }
-    
-    .main-title p {
-        font-size: 16px;
-        color: var(--soft-brown);
-        font-weight: 500;
-    }
-    
-    .card {
-        background: var(--milk-white);
-        padding: 25px;
-        border-radius: 12px;
-        box-shadow: 0 4px 8px rgba(210, 180, 140, 0.1);
-        margin-bottom: 25px;
-        border: 1px solid var(--warm-beige);
-        font-family: 'Arial', sans-serif;
-    }
-    
-    .card h3 {
-        color: var(--medium-brown);
-        border-bottom: 1px solid var(--light-cheese);
-        padding-bottom: 10px;
-        margin-bottom: 20px;
-        font-family: 'Georgia', serif;
-        font-weight: 600;
-    }
-    
-    .stButton>button {
-        background: linear-gradient(135deg, var(--light-cheese) 0%, var(--soft-gold) 100%);
-        color: var(--medium-brown) !important;
-        border: 1px solid var(--light-brown);
-        padding: 10px 20px;
-        border-radius: 8px;
-        font-weight: 600;
-        font-size: 14px;
-        transition: all 0.3s ease;
-    }
-    
-    .stButton>button:hover {
-        background: linear-gradient(135deg, var(--soft-gold) 0%, var(--light-brown) 100%);
-        color: var(--medium-brown) !important;
-        border-color: var(--soft-brown);
-        transform: translateY(-2px);
-        box-shadow: 0 4px 8px rgba(139, 115, 85, 0.15);
-    }
-    
-    .sidebar-header {
-        background: linear-gradient(135deg, var(--light-cheese) 0%, var(--warm-beige) 100%);
-        padding: 15px;
-        border-radius: 10px;
-        margin-bottom: 20px;
-        text-align: center;
-        border: 1px solid var(--soft-gold);
-    }
-    
-    .sidebar-header h2 {
-        color: var(--medium-brown);
-        margin: 0;
-        font-family: 'Georgia', serif;
-        font-size: 22px;
-    }
-    
-    .metric-card {
-        background: var(--off-white);
-        padding: 12px;
-        border-radius: 8px;
-        border: 1px solid var(--warm-beige);
-        margin-bottom: 8px;
-        font-size: 14px;
-    }
-    
-    .stMetric {
-        background: var(--off-white);
-        padding: 12px;
-        border-radius: 8px;
-        border: 1px solid var(--warm-beige);
-    }
-    
-    [data-testid="stMetricValue"] {
-        color: var(--medium-brown) !important;
-        font-weight: 600;
-    }
-    
-    [data-testid="stMetricLabel"] {
-        color: var(--soft-brown) !important;
-    }
-    
-    .data-warning {
-        background-color: #FFF3CD;
-        border: 1px solid var(--soft-gold);
-        color: #856404;
-        padding: 12px;
-        border-radius: 8px;
-        margin: 10px 0;
-        font-size: 14px;
-    }
-    
-    /* Input field styling */
-    .stSelectbox div[data-baseweb="select"] > div,
-    .stNumberInput input,
-    .stMultiselect div[data-baseweb="select"] > div,
-    .stDateInput input {
-        background-color: var(--off-white) !important;
-        border-color: var(--warm-beige) !important;
-        border-radius: 6px !important;
-    }
-    
-    /* Custom scrollbar */
-    ::-webkit-scrollbar {
-        width: 8px;
-    }
-    
-    ::-webkit-scrollbar-track {
-        background: var(--off-white);
-    }
-    
-    ::-webkit-scrollbar-thumb {
-        background: var(--light-brown);
-        border-radius: 4px;
-    }
-    
-    ::-webkit-scrollbar-thumb:hover {
-        background: var(--soft-brown);
-    }
-    
-    /* Footer styling */
-    .footer {
-        text-align: center;
-        color: var(--medium-brown);
-        padding: 20px;
-        margin-top: 30px;
-        border-top: 1px solid var(--light-cheese);
-        background: var(--off-white);
-        border-radius: 10px;
-        font-family: 'Georgia', serif;
-    }
-    
-    /* Cheese icon */
-    .cheese-icon {
-        color: var(--medium-brown);
-    }
-    
-    /* Success messages */
-    .stSuccess {
-        background-color: #F0F9EB !important;
-        border-color: #B7EB8F !important;
-        color: #52C41A !important;
-    }
-    
-    /* Info messages */
-    .stInfo {
-        background-color: #E6F7FF !important;
-        border-color: #91D5FF !important;
-        color: #1890FF !important;
-    }
-    
-    /* Warning messages */
-    .stWarning {
-        background-color: #FFFBE6 !important;
-        border-color: #FFE58F !important;
-        color: #FAAD14 !important;
-    }
-    
-    /* Error messages */
-    .stError {
-        background-color: #FFF2F0 !important;
-        border-color: #FFCCC7 !important;
-        color: #FF4D4F !important;
-    }
-    
-    /* App background */
-    .stApp {
-        background: linear-gradient(180deg, var(--milk-white) 0%, var(--off-white) 100%);
-    }
-    
-    /* Radio button styling */
-    .stRadio > div {
-        background: var(--off-white);
-        padding: 10px;
-        border-radius: 8px;
-        border: 1px solid var(--warm-beige);
-    }
-    
-    /* Dataframe styling */
-    .dataframe {
-        border: 1px solid var(--warm-beige) !important;
-        border-radius: 8px !important;
-    }
-    
-    /* Make text more readable */
-    p, li, span, div {
-        color: var(--medium-brown);
-    }
-    
-    /* Table headers */
-    th {
-        background-color: var(--warm-beige) !important;
-        color: var(--medium-brown) !important;
-    }
+@st.cache_resource
+def get_minified_css():
+    """
+    Read the stylesheet and strip comments and whitespace once per server process.
     
-    /* Table rows */
-    tr:nth-child(even) {
-        background-color: var(--off-white) !important;
-    }
-</style>
-""", unsafe_allow_html=True)
+    The stylesheet still has to be injected on every rerun or Streamlit drops it,
+    so this keeps the payload sent each time as small as possible.
+    """
+    with open(CSS_PATH, encoding="utf-8") as css_file:
+        css = re.sub(r"/\*.*?\*/", "", css_file.read(), flags=re.DOTALL)
+    css = re.sub(r"\s+", " ", css).strip()
+    return f"<style>{css}</style>"
+
+st.markdown(get_minified_css(), unsafe_allow_html=True)
 
 # Sidebar with Date Range Selector
 with st.sidebar:
@@ -610,8 +739,7 @@ with st.sidebar:
     
     if date_range_option == "🗓️ Custom Range":
         # Calculate min and max dates from data
-        if "all_data" not in st.session_state:
-            st.session_state.all_data = get_all_cached_data()
+        st.session_state.all_data = get_all_cached_data()
         
         if st.session_state.all_data is not None and not st.session_state.all_data.empty:
             min_date_all = st.session_state.all_data["DATE"].min().date()
@@ -656,32 +784,39 @@ with st.sidebar:
     
     st.markdown("---")
     
-    # Load data with selected date range
-    if "all_data" not in st.session_state:
-        with st.spinner("Loading production data..."):
-            st.session_state.all_data = get_all_cached_data()
+    # Load data with selected date range - read from the shared store on every
+    # rerun so sessions pick up background refreshes
+    with st.spinner("Loading production data..."):
+        st.session_state.all_data = get_all_cached_data()
     
     all_data = st.session_state.all_data
+    load_error = get_data_store(SPREADSHEET_NAME, SHEET_NAME)["last_error"]
     
     if all_data is None or all_data.empty:
         st.error("⚠️ Failed to load data")
+        if load_error:
+            st.caption(f"{load_error} - retrying automatically in a few minutes.")
         
         with st.expander("Technical Support"):
             if st.button("Test Connection"):
                 try:
-                    worksheet = connect_to_gsheet()
-                    if worksheet:
+                    spreadsheet = connect_to_gsheet()
+                    if spreadsheet:
                         st.success("✓ Connection successful!")
                 except Exception as e:
                     st.error(f"✗ Error: {e}")
             
             if st.button("Reload Data"):
                 st.cache_data.clear()
+                get_data_store.clear()
                 st.session_state.all_data = get_all_cached_data()
                 st.rerun()
         
         st.stop()
     
+    if load_error:
+        st.warning(f"⚠️ Showing earlier data - {load_error}. Retrying automatically.")
+    
     # Filter data based on selected date range
     with st.spinner("Applying date filter..."):
         if default_range == "custom" and custom_start_date and custom_end_date:
@@ -692,7 +827,8 @@ with st.sidebar:
             )
             date_info = f"Custom: {custom_start_date.strftime('%d %b %Y')} to {custom_end_date.strftime('%d %b %Y')}"
         elif default_range == "all_time":
-            data = all_data.copy()
+            # Nothing below modifies the frame, so the cached data is used as-is
+            data = all_data
             date_info = "All Time Data"
         else:
             data = filter_data_by_date_range(all_data, default_range=default_range)
@@ -709,8 +845,11 @@ with st.sidebar:
     st.session_state.filtered_data = data
     
     # Get unique values from filtered data
-    unique_items = sorted(data["ITEM_NAME"].dropna().unique().tolist())
-    unique_depts = sorted(["All Production Areas"] + data["DEPARTMENT"].dropna().unique().tolist())
+    # ITEM_NAME and DEPARTMENT are categorical - their used categories are already
+    # unique and sorted, so no pass over the rows is needed
+    unique_items = data["ITEM_NAME"].cat.remove_unused_categories().cat.categories.tolist()
+    unique_items_lower = [item.lower() for item in unique_items]
+    unique_depts = sorted(["All Production Areas"] + data["DEPARTMENT"].cat.remove_unused_categories().cat.categories.tolist())
     
     st.markdown("### 📊 Production Overview")
     
@@ -737,6 +876,7 @@ with st.sidebar:
     
     if st.button("🔄 Refresh & Apply Filter", use_container_width=True):
         st.cache_data.clear()
+        get_data_store.clear()
         with st.spinner("Updating..."):
             st.session_state.all_data = get_all_cached_data()
         st.rerun()
@@ -834,10 +974,12 @@ if view_mode_clean == "Allocation Calculator":
                     help="Start typing to find ingredients"
                 )
                 
-                # Filter items based on search
+                # Filter items based on search - only the first matches are sent to the browser
                 if search_term:
-                    filtered_items = [item for item in unique_items 
-                                    if search_term.lower() in item.lower()]
+                    search_lower = search_term.lower()
+                    matching_items = [item for item, item_lower in zip(unique_items, unique_items_lower)
+                                      if search_lower in item_lower]
+                    filtered_items = matching_items[:MAX_SEARCH_RESULTS]
                 else:
                     filtered_items = unique_items
                 
@@ -852,7 +994,10 @@ if view_mode_clean == "Allocation Calculator":
                     
                     # Show matching count
                     if search_term:
-                        st.caption(f"Found {len(filtered_items)} matching ingredients")
+                        if len(matching_items) > MAX_SEARCH_RESULTS:
+                            st.caption(f"Found {len(matching_items)} matching ingredients, showing the first {MAX_SEARCH_RESULTS}")
+                        else:
+                            st.caption(f"Found {len(matching_items)} matching ingredients")
                 
                 with col2:
                     qty = st.number_input(
@@ -875,10 +1020,53 @@ if view_mode_clean == "Allocation Calculator":
         st.markdown("</div>")
         
         if submitted and entries:
-            for idx, (item, qty) in enumerate(entries):
-                with st.spinner(f"Calculating allocation for {item}..."):
-                    result = allocate_quantity(data, item, qty, selected_dept)
+            # One index lookup for the whole batch instead of one per ingredient
+            usage_index = get_usage_index(data)
+            with st.spinner("Calculating allocations..."):
+                results = [
+                    (item, qty, allocate_quantity(data, item, qty, selected_dept, usage_index=usage_index))
+                    for item, qty in entries
+                ]
+            
+            # Render every successful allocation as one table and one report,
+            # instead of a separate table and download per ingredient
+            allocated = [(item, result) for item, qty, result in results
+                         if result is not None and not result.empty]
+            if allocated:
+                display_df = pd.concat(
+                    [result[["DEPARTMENT", "PROPORTION", "ALLOCATED_QUANTITY"]].assign(ITEM=item)
+                     for item, result in allocated],
+                    ignore_index=True
+                )[["ITEM", "DEPARTMENT", "PROPORTION", "ALLOCATED_QUANTITY"]]
+                display_df.columns = ["Ingredient", "Production Area", "Usage %", "Allocated Quantity"]
+                display_df["Usage %"] = display_df["Usage %"].round(2)
                 
+                st.markdown('<div class="card">', unsafe_allow_html=True)
+                st.markdown("#### 📊 Allocation Summary")
+                st.dataframe(
+                    display_df,
+                    use_container_width=True,
+                    hide_index=True,
+                    column_config={
+                        "Usage %": st.column_config.ProgressColumn(
+                            format="%.1f%%",
+                            min_value=0,
+                            max_value=100
+                        )
+                    }
+                )
+                
+                csv = to_csv_bytes(display_df)
+                st.download_button(
+                    label="📥 Download Report",
+                    data=csv,
+                    file_name=f"allocation_{datetime.now().strftime('%Y%m%d')}.csv",
+                    mime="text/csv",
+                    use_container_width=True
+                )
+                st.markdown("</div>")
+            
+            for item, qty, result in results:
                 if result is not None and not result.empty:
                     st.markdown('<div class="card">', unsafe_allow_html=True)
                     st.markdown(f"### 📋 Allocation for: **{item}**")
@@ -890,34 +1078,17 @@ if view_mode_clean == "Allocation Calculator":
                         st.caption(f"*Based on {len(data):,} records from {calc_min_date.strftime('%d %b %Y')} to {calc_max_date.strftime('%d %b %Y')}*")
                     
                     # Show data summary
-                    item_data = data[data["ITEM_NAME"].str.contains(item, case=False, na=False)]
+                    item_data = data[data["ITEM_NAME_LOWER"].str.contains(item.lower(), regex=False, na=False)]
                     if not item_data.empty:
                         total_usage = item_data["QUANTITY"].sum()
                         usage_count = len(item_data)
                         st.info(f"**Historical Usage:** {total_usage:,.0f} units across {usage_count:,} transactions")
                     
-                    display_df = result[["DEPARTMENT", "PROPORTION", "ALLOCATED_QUANTITY"]].copy()
-                    display_df.columns = ["Production Area", "Usage %", "Allocated Quantity"]
-                    display_df["Usage %"] = display_df["Usage %"].round(2)
-                    
-                    st.markdown("#### 📊 Allocation Summary")
-                    st.dataframe(
-                        display_df,
-                        use_container_width=True,
-                        column_config={
-                            "Usage %": st.column_config.ProgressColumn(
-                                format="%.1f%%",
-                                min_value=0,
-                                max_value=100
-                            )
-                        }
-                    )
-                    
                     col1, col2, col3 = st.columns(3)
                     with col1:
-                        st.metric("Total Allocated", f"{display_df['Allocated Quantity'].sum():.0f}")
+                        st.metric("Total Allocated", f"{result['ALLOCATED_QUANTITY'].sum():.0f}")
                     with col2:
-                        st.metric("Production Areas", len(display_df))
+                        st.metric("Production Areas", len(result))
                     with col3:
                         st.metric("Batch Size", f"{qty:.1f}")
                     
@@ -925,15 +1096,6 @@ if view_mode_clean == "Allocation Calculator":
                     chart = generate_allocation_chart(result, item)
                     st.plotly_chart(chart, use_container_width=True)
                     
-                    csv = display_df.to_csv(index=False)
-                    st.download_button(
-                        label="📥 Download Report",
-                        data=csv,
-                        file_name=f"allocation_{item.replace('/', '_')[:20]}_{datetime.now().strftime('%Y%m%d')}.csv",
-                        mime="text/csv",
-                        use_container_width=True
-                    )
-                    
                     st.markdown("</div>")
                 else:
                     # Enhanced error message with suggestions
@@ -960,8 +1122,8 @@ if view_mode_clean == "Allocation Calculator":
                         # Check if item exists with different spelling
                         item_exists = False
                         for col in ["ITEM_NAME", "ITEM_SERIAL"]:
-                            if col in data.columns:
-                                matches = data[data[col].astype(str).str.contains(item, case=False, na=False)]
+                            if f"{col}_LOWER" in data.columns:
+                                matches = data[data[f"{col}_LOWER"].str.contains(item.lower(), regex=False, na=False)]
                                 if not matches.empty:
                                     item_exists = True
                                     st.write(f"**Found {len(matches)} records with similar names in {col}**")
@@ -995,11 +1157,15 @@ elif view_mode_clean == "Data Overview":
         with col2:
             filter_depts = st.multiselect("Filter by Areas", unique_depts[1:], default=[])
         
-        filtered_data = data.copy()
+        # Combine the filters into one mask and select once, keeping only the columns
+        # this tab shows, instead of copying the whole frame on every rerun
+        overview_cols = ["DATE", "ITEM_NAME", "DEPARTMENT", "QUANTITY", "UNIT_OF_MEASURE"]
+        mask = np.ones(len(data), dtype=bool)
         if filter_items:
-            filtered_data = filtered_data[filtered_data["ITEM_NAME"].isin(filter_items)]
+            mask &= data["ITEM_NAME"].isin(filter_items).to_numpy()
         if filter_depts:
-            filtered_data = filtered_data[filtered_data["DEPARTMENT"].isin(filter_depts)]
+            mask &= data["DEPARTMENT"].isin(filter_depts).to_numpy()
+        filtered_data = data.loc[mask, overview_cols]
         
         st.markdown("#### 📊 Statistics")
         cols = st.columns(4)
@@ -1013,8 +1179,7 @@ elif view_mode_clean == "Data Overview":
             st.metric("Areas", filtered_data["DEPARTMENT"].nunique())
         
         st.markdown("#### 👁️ Data Preview")
-        preview_cols = ["DATE", "ITEM_NAME", "DEPARTMENT", "QUANTITY", "UNIT_OF_MEASURE"]
-        preview_data = filtered_data[preview_cols].head(100).copy()
+        preview_data = filtered_data.head(100).copy()
         preview_data["DATE"] = preview_data["DATE"].dt.strftime('%d %b %Y')
         
         st.dataframe(
@@ -1027,7 +1192,9 @@ elif view_mode_clean == "Data Overview":
             st.info(f"Showing 100 of {len(filtered_data)} records")
         
         st.markdown("#### 🏆 Top Ingredients (Selected Date Range)")
-        top_items = filtered_data.groupby("ITEM_NAME")["QUANTITY"].sum().nlargest(10).reset_index()
+        # observed=True skips categories absent from the filtered rows; sort=False skips
+        # ordering groups that nlargest reorders anyway
+        top_items = filtered_data.groupby("ITEM_NAME", observed=True, sort=False)["QUANTITY"].sum().nlargest(10).reset_index()
         if not top_items.empty:
             fig1 = px.bar(
                 top_items,
@@ -1048,9 +1215,14 @@ elif view_mode_clean == "Data Overview":
         
         # Monthly trend for selected date range
         st.markdown("#### 📅 Monthly Usage Trend")
-        monthly_data = filtered_data.copy()
-        monthly_data["MONTH"] = monthly_data["DATE"].dt.to_period("M").astype(str)
-        monthly_trend = monthly_data.groupby("MONTH")["QUANTITY"].sum().reset_index()
+        # Month keys come from a numpy datetime64[M] cast rather than a PeriodArray,
+        # so the selection is not copied and rows without a date are left out
+        months = filtered_data["DATE"].to_numpy().astype("datetime64[M]")
+        monthly_usage = filtered_data["QUANTITY"].groupby(months).sum()
+        monthly_trend = pd.DataFrame({
+            "MONTH": np.datetime_as_string(monthly_usage.index.to_numpy(), unit="M"),
+            "QUANTITY": monthly_usage.to_numpy()
+        })
         
         if not monthly_trend.empty and len(monthly_trend) > 1:
             fig2 = px.line(